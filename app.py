@@ -1,9 +1,31 @@
 from flask import Flask, render_template, jsonify, request
+import atexit
 import enum
+import hashlib
+import json
+import logging
+import os
+import queue
+import sqlite3
+import stat
+import struct
+import sys
+import tempfile
 import time
 import webbrowser
 import threading
-from typing import Optional, List, Dict, Tuple
+from array import array
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import lru_cache
+from multiprocessing import resource_tracker, shared_memory
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Optional, List, Dict, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: общая память между процессами недоступна
+    fcntl = None
 
 
 
@@ -38,6 +60,9 @@ CELL_TEXT: Dict[CellType, str] = {
 }
 
 W, H = 5, 5
+MAX_MAP_SIDE = 100
+
+log = logging.getLogger(__name__)
 
 
 class Direction(enum.Enum):
@@ -47,44 +72,92 @@ class Direction(enum.Enum):
     STEP_RIGHT = "БВправо"
 
 
+# Смещение (dx, dy) для каждой команды; "вперед" - в сторону строки финиша.
+DIRECTION_DELTAS: Dict[Direction, Tuple[int, int]] = {
+    Direction.STEP_BIO: (0, 1),
+    Direction.STEP_BACK: (0, -1),
+    Direction.STEP_LEFT: (-1, 0),
+    Direction.STEP_RIGHT: (1, 0),
+}
+
+
+CELL_TYPES: List[CellType] = list(CellType)
+CELL_TYPE_INDEX: Dict[CellType, int] = {cell_type: i for i, cell_type in enumerate(CELL_TYPES)}
+UNPROCESSED_INDEXES = (CELL_TYPE_INDEX[CellType.RASTENIE], CELL_TYPE_INDEX[CellType.PROBIRKA])
+
+
+class MissionState:
+    """Состояние миссии: карта (байт на клетку, индекс в CELL_TYPES) и робот.
+
+    RobotLabyrinth и RobotBiolog хранят все в этих полях, поэтому те же
+    правила могут работать поверх другого хранилища с такими же полями.
+    """
+
+    def __init__(self, width: int, height: int):
+        self.width = width
+        self.height = height
+        self.grid = bytearray([CELL_TYPE_INDEX[CellType.VODA]]) * (width * height)
+        self.version = 0
+        self.robot_x = 0
+        self.robot_y = 0
+        self.moving_right = True
+        self.history: List[str] = []
+
+    def append_history(self, line: str) -> None:
+        self.history.append(line)
+
+
+def _cell_dict(cell_type: CellType, x: int, y: int, has_robot: bool):
+    return {
+        'x': x,
+        'y': y,
+        'type': cell_type.name,
+        'color': CELL_COLORS[cell_type],
+        'text': CELL_TEXT[cell_type],
+        'has_robot': has_robot
+    }
+
 
 class RobotCell:
-    def __init__(self, cell_type: CellType, x: int = 0, y: int = 0):
-        self.cell_type: CellType = cell_type
-        self.has_robot: bool = False
+    def __init__(self, state: MissionState, x: int = 0, y: int = 0):
+        self.state = state
         self.x = x
         self.y = y
+        self.index = y * state.width + x
+
+    @property
+    def cell_type(self) -> CellType:
+        return CELL_TYPES[self.state.grid[self.index]]
+
+    @cell_type.setter
+    def cell_type(self, cell_type: CellType) -> None:
+        self.state.grid[self.index] = CELL_TYPE_INDEX[cell_type]
+
+    @property
+    def has_robot(self) -> bool:
+        return self.state.robot_x == self.x and self.state.robot_y == self.y
 
     def to_dict(self):
         """Сериализация клетки для передачи в JavaScript."""
-        return {
-            'x': self.x,
-            'y': self.y,
-            'type': self.cell_type.name,
-            'color': CELL_COLORS[self.cell_type],
-            'text': CELL_TEXT[self.cell_type],
-            'has_robot': self.has_robot
-        }
+        return _cell_dict(self.cell_type, self.x, self.y, self.has_robot)
 
 
 class RobotLabyrinth:
-    def __init__(self, width: int, height: int):
+    def __init__(self, width: int, height: int, state: Optional[MissionState] = None):
         self.width = width
         self.height = height
+        self.state = state if state is not None else MissionState(width, height)
         self.cells: List[List[RobotCell]] = [
-            [RobotCell(CellType.VODA, x, y) for x in range(width)]
+            [RobotCell(self.state, x, y) for x in range(width)]
             for y in range(height)
         ]
 
     def initialize_labyrinth(self, default_type: CellType) -> None:
-        for row in self.cells:
-            for cell in row:
-                cell.cell_type = default_type
-                cell.has_robot = False
+        self.state.grid[:] = bytes([CELL_TYPE_INDEX[default_type]]) * len(self.state.grid)
 
     def set_cell_type(self, x: int, y: int, cell_type: CellType) -> None:
         if 0 <= x < self.width and 0 <= y < self.height:
-            self.cells[y][x].cell_type = cell_type
+            self.state.grid[y * self.width + x] = CELL_TYPE_INDEX[cell_type]
 
     def initialize_mission_map(self):
         self.initialize_labyrinth(CellType.VODA)
@@ -111,101 +184,162 @@ class RobotLabyrinth:
         self.set_cell_type(4, 0, CellType.CONTAINER)
         self.set_cell_type(3, 0, CellType.LAB)
 
-        self.cells[0][0].has_robot = True
-
     def serialize(self):
         """Возвращает список словарей для передачи в JSON."""
+        grid, width = self.state.grid, self.width
+        robot_x, robot_y = self.state.robot_x, self.state.robot_y
         return [
-            [cell.to_dict() for cell in row]
-            for row in self.cells
+            [_cell_dict(CELL_TYPES[grid[y * width + x]], x, y, x == robot_x and y == robot_y)
+             for x in range(width)]
+            for y in range(self.height)
         ]
 
+    def cell_names(self) -> List[List[str]]:
+        """Компактное представление карты: имена типов клеток по строкам."""
+        grid, width = self.state.grid, self.width
+        return [[CELL_TYPES[grid[y * width + x]].name for x in range(width)] for y in range(self.height)]
+
+    @classmethod
+    def from_cell_names(cls, names: List[List[str]]) -> 'RobotLabyrinth':
+        """Восстанавливает лабиринт из результата cell_names()."""
+        if not (isinstance(names, list) and names and isinstance(names[0], list) and names[0]
+                and all(isinstance(row, list) and len(row) == len(names[0]) for row in names)):
+            raise ValueError("Карта должна быть непустой прямоугольной таблицей.")
+        if len(names) > MAX_MAP_SIDE or len(names[0]) > MAX_MAP_SIDE:
+            raise ValueError(f"Карта больше {MAX_MAP_SIDE}x{MAX_MAP_SIDE} клеток.")
+        unknown = {name for row in names for name in row} - CellType.__members__.keys()
+        if unknown:
+            raise ValueError(f"Неизвестные типы клеток: {', '.join(sorted(map(str, unknown)))}")
+
+        labyrinth = cls(len(names[0]), len(names))
+        labyrinth.state.grid[:] = bytes(CELL_TYPE_INDEX[CellType[name]] for row in names for name in row)
+        return labyrinth
+
 
 class RobotBiolog:
-    def __init__(self, labyrinth: RobotLabyrinth):
+    def __init__(self, labyrinth: RobotLabyrinth, resume: bool = False):
+        """resume=True подключает робота к уже идущей миссии в labyrinth.state."""
         self.labyrinth = labyrinth
-        self.action_history: List[str] = []
-
-        self.current_cell: Optional[RobotCell] = self.labyrinth.cells[0][0]
-        self.current_cell.has_robot = True
+        self.state = labyrinth.state
+        if resume:
+            return
 
-        self.current_x = 0
-        self.current_y = 0
-        self.moving_right = True
+        self.state.history = []
+        self.state.robot_x = 0
+        self.state.robot_y = 0
+        self.state.moving_right = True
+        self.state.version = 0
 
         self._log_action(f"Начало миссии в ({self.current_x},{self.current_y}).")
 
+    # Поля робота хранятся в MissionState; свойства - для внешнего кода.
+    @property
+    def current_x(self) -> int:
+        return self.state.robot_x
+
+    @property
+    def current_y(self) -> int:
+        return self.state.robot_y
+
+    @property
+    def moving_right(self) -> bool:
+        return self.state.moving_right
+
+    @property
+    def version(self) -> int:
+        return self.state.version
+
+    @version.setter
+    def version(self, version: int) -> None:
+        self.state.version = version
+
+    @property
+    def action_history(self) -> List[str]:
+        return self.state.history
+
+    @action_history.setter
+    def action_history(self, history: List[str]) -> None:
+        self.state.history = history
+
+    @property
+    def current_cell(self) -> Optional[RobotCell]:
+        return self.labyrinth.cells[self.state.robot_y][self.state.robot_x]
+
     def _log_action(self, action: str):
         timestamp = time.strftime("%H:%M:%S")
-        self.action_history.append(f"[{timestamp}] {action}")
+        self.state.append_history(f"[{timestamp}] {action}")
 
     def _move_robot(self, target: RobotCell) -> RobotCell:
         if not self.current_cell: raise Exception("Робот не находится в клетке!")
 
-        self.current_cell.has_robot = False
-        target.has_robot = True
-        self.current_cell = target
-        self.current_x = target.x
-        self.current_y = target.y
+        self.state.robot_x = target.x
+        self.state.robot_y = target.y
 
         self._log_action(f"Перемещение: Шаг -> ({target.x},{target.y}). Тип: {target.cell_type.value}")
         return target
 
     def clear_plant(self) -> None:
-        if self.current_cell and self.current_cell.cell_type == CellType.RASTENIE:
-            self.current_cell.cell_type = CellType.PROBIRKA
+        cell = self.current_cell
+        if cell and cell.cell_type == CellType.RASTENIE:
+            cell.cell_type = CellType.PROBIRKA
 
     def prob(self) -> None:
-        if self.current_cell and self.current_cell.cell_type == CellType.PROBIRKA:
-            self.current_cell.cell_type = CellType.OBRABOTANO
+        cell = self.current_cell
+        if cell and cell.cell_type == CellType.PROBIRKA:
+            cell.cell_type = CellType.OBRABOTANO
 
     def process_current_cell(self) -> None:
-        if not self.current_cell: return
+        cell = self.current_cell
+        if not cell: return
 
-        current_coords = f"({self.current_cell.x},{self.current_cell.y})"
+        current_coords = f"({cell.x},{cell.y})"
 
-        if self.current_cell.cell_type in (CellType.RASTENIE, CellType.PROBIRKA):
-            if self.current_cell.cell_type == CellType.RASTENIE:
+        if cell.cell_type in (CellType.RASTENIE, CellType.PROBIRKA):
+            if cell.cell_type == CellType.RASTENIE:
                 self._log_action(f"В клетке {current_coords}: Найдено **Растение**. Обработка в Пробирку.")
                 self.clear_plant()
 
-            if self.current_cell.cell_type == CellType.PROBIRKA:
+            if cell.cell_type == CellType.PROBIRKA:
                 self._log_action(f"В клетке {current_coords}: Найдена **Пробирка**. Обработка в Обработано.")
                 self.prob()
 
-        if self.current_cell.cell_type == CellType.FINISH:
+        if cell.cell_type == CellType.FINISH:
             self._log_action(f"В клетке {current_coords}: Достигнут **Финиш**!")
 
     def is_mission_complete(self) -> bool:
-        if not (self.current_x == W - 1 and self.current_y == H - 1): return False
+        state = self.state
+        if not (state.robot_x == self.labyrinth.width - 1 and state.robot_y == self.labyrinth.height - 1):
+            return False
 
-        for row in self.labyrinth.cells:
-            for cell in row:
-                if cell.cell_type in (CellType.RASTENIE, CellType.PROBIRKA): return False
+        grid = state.grid
+        for index in UNPROCESSED_INDEXES:
+            if index in grid: return False
 
         return True
 
     def find_next_snake_move(self) -> Optional[RobotCell]:
         """Алгоритм движения "Змейка" строго по всем клеткам."""
-        current_x, current_y = self.current_x, self.current_y
+        state = self.state
+        current_x, current_y = state.robot_x, state.robot_y
 
         
-        dx = 1 if self.moving_right else -1
+        dx = 1 if state.moving_right else -1
         next_x = current_x + dx
 
-        if 0 <= next_x < W:
+        if 0 <= next_x < self.labyrinth.width:
             return self.labyrinth.cells[current_y][next_x]
 
         
-        if current_y < H - 1:
+        if current_y < self.labyrinth.height - 1:
             next_y = current_y + 1
-            self.moving_right = not self.moving_right
+            state.moving_right = not state.moving_right
             return self.labyrinth.cells[next_y][current_x]
 
         return None
 
     def execute_single_step(self) -> bool:
         if self.is_mission_complete(): return False
+        self.state.version += 1
 
         
         self.process_current_cell()
@@ -217,9 +351,10 @@ class RobotBiolog:
             self._move_robot(next_cell)
 
             
-            if self.current_cell.cell_type in (CellType.LAB, CellType.CONTAINER):
+            cell_type = next_cell.cell_type
+            if cell_type in (CellType.LAB, CellType.CONTAINER):
                 self._log_action(
-                    f"Запрещено движение по клетке {self.current_cell.cell_type.value} в ({self.current_x},{self.current_y})!")
+                    f"Запрещено движение по клетке {cell_type.value} в ({next_cell.x},{next_cell.y})!")
 
             return True
         else:
@@ -229,23 +364,986 @@ class RobotBiolog:
 
     def get_state(self):
         """Возвращает текущее состояние для отправки клиенту."""
+        state = self.state
         return {
-            'W': W,
-            'H': H,
+            'W': self.labyrinth.width,
+            'H': self.labyrinth.height,
             'map': self.labyrinth.serialize(),
-            'robot_x': self.current_x,
-            'robot_y': self.current_y,
-            'current_cell_type': self.current_cell.cell_type.name if self.current_cell else None,
-            'history': self.action_history,
-            'is_complete': self.is_mission_complete()
+            'robot_x': state.robot_x,
+            'robot_y': state.robot_y,
+            'current_cell_type': CELL_TYPES[state.grid[state.robot_y * self.labyrinth.width + state.robot_x]].name,
+            'history': state.history,
+            'is_complete': self.is_mission_complete(),
+            'version': state.version,
         }
 
+    def to_snapshot(self):
+        """Снимок состояния для сохранения на диск."""
+        state = self.state
+        return {
+            'version': state.version,
+            'cells': self.labyrinth.cell_names(),
+            'robot_x': state.robot_x,
+            'robot_y': state.robot_y,
+            'moving_right': state.moving_right,
+            'history': list(state.history),
+        }
+
+    @classmethod
+    def from_snapshot(cls, snapshot) -> 'RobotBiolog':
+        """Восстанавливает робота из снимка to_snapshot()."""
+        robot = cls(RobotLabyrinth.from_cell_names(snapshot['cells']), resume=True)
+        state = robot.state
+        state.robot_x = snapshot['robot_x']
+        state.robot_y = snapshot['robot_y']
+        state.moving_right = snapshot['moving_right']
+        state.version = snapshot['version']
+        state.history = list(snapshot['history'])
+        return robot
+
+
+class ProgramError(ValueError):
+    """Ошибка в тексте программы робота."""
+
+
+DIRECTIONS: List[Direction] = list(Direction)
+
+OP_HALT, OP_MOVE, OP_PROCESS, OP_JUMP, OP_JUMP_IF, OP_JUMP_UNLESS, OP_LOOP_START, OP_LOOP_END = range(8)
+
+# Результат команды ОБРАБОТАТЬ для каждого типа клетки (как process_current_cell).
+PROCESS_TABLE = bytes(
+    CELL_TYPES.index(CellType.OBRABOTANO) if t in (CellType.RASTENIE, CellType.PROBIRKA) else i
+    for i, t in enumerate(CELL_TYPES)
+)
+FORBIDDEN_TABLE = bytes(t in (CellType.LAB, CellType.CONTAINER) for t in CELL_TYPES)
+
+PROGRAM_MAX_STEPS = 10_000_000
+PROGRAM_MAX_DEPTH = 64
+PROGRAM_MAX_REPEAT = 2 ** 31 - 1
+PROGRAM_MAX_SOURCE = 64 * 1024
+
+
+class RobotProgram:
+    """Программа робота, скомпилированная в плоский массив инструкций.
+
+    Каждая инструкция - три целых: код операции и два аргумента.
+    Команды языка (регистр не важен, после # - комментарий):
+
+        БВперед | БНазад | БВлево | БВправо      шаг в соседнюю клетку
+        ОБРАБОТАТЬ                              обработка текущей клетки
+        ПОВТОР n ... КОНЕЦ
+        ПОКА [НЕ] <тип> ... КОНЕЦ
+        ЕСЛИ [НЕ] <тип> ... [ИНАЧЕ ...] КОНЕЦ
+
+    <тип> - значение или имя CellType текущей клетки (Растение, RASTENIE).
+    """
+
+    _DIRECTION_WORDS = {d.value.upper(): i for i, d in enumerate(DIRECTIONS)}
+    _CELL_WORDS = {**{t.value.upper(): i for i, t in enumerate(CELL_TYPES)},
+                   **{t.name: i for i, t in enumerate(CELL_TYPES)}}
+
+    def __init__(self, source: str):
+        if not isinstance(source, str):
+            raise ProgramError("Текст программы должен быть строкой.")
+        if len(source) > PROGRAM_MAX_SOURCE:
+            raise ProgramError(f"Текст программы длиннее {PROGRAM_MAX_SOURCE} символов.")
+        self.source = source
+        self.code = array('i')
+
+        self._tokens: List[Tuple[str, int]] = []
+        for lineno, line in enumerate(source.splitlines(), 1):
+            for word in line.split('#', 1)[0].split():
+                self._tokens.append((word.upper(), lineno))
+        self._pos = 0
+
+        self._compile_block(depth=0)
+        if self._pos < len(self._tokens):
+            word, lineno = self._tokens[self._pos]
+            raise ProgramError(f"Строка {lineno}: неожиданное {word} вне блока.")
+        self._emit(OP_HALT)
+        del self._tokens
+
+    def _emit(self, op: int, a: int = 0, b: int = 0) -> int:
+        self.code.extend((op, a, b))
+        return len(self.code) - 3
+
+    def _next(self, expected: str) -> Tuple[str, int]:
+        if self._pos >= len(self._tokens):
+            raise ProgramError(f"Неожиданный конец программы: ожидается {expected}.")
+        token = self._tokens[self._pos]
+        self._pos += 1
+        return token
+
+    def _condition(self) -> Tuple[bool, int]:
+        word, lineno = self._next("тип клетки")
+        negate = word == 'НЕ'
+        if negate:
+            word, lineno = self._next("тип клетки")
+        if word not in self._CELL_WORDS:
+            raise ProgramError(f"Строка {lineno}: неизвестный тип клетки {word}.")
+        return negate, self._CELL_WORDS[word]
+
+    def _compile_block(self, depth: int) -> Optional[str]:
+        """Компилирует команды до КОНЕЦ/ИНАЧЕ и возвращает встреченное слово."""
+        if depth > PROGRAM_MAX_DEPTH:
+            raise ProgramError(f"Превышена глубина вложенности {PROGRAM_MAX_DEPTH}.")
+
+        while self._pos < len(self._tokens):
+            word, lineno = self._next("команда")
+
+            if word in ('КОНЕЦ', 'ИНАЧЕ'):
+                if depth == 0:
+                    raise ProgramError(f"Строка {lineno}: {word} без открывающего блока.")
+                return word
+            elif word in self._DIRECTION_WORDS:
+                self._emit(OP_MOVE, self._DIRECTION_WORDS[word])
+            elif word == 'ОБРАБОТАТЬ':
+                self._emit(OP_PROCESS)
+            elif word == 'ПОВТОР':
+                count, lineno = self._next("число повторов")
+                if not (count.isascii() and count.isdigit()):
+                    raise ProgramError(f"Строка {lineno}: ожидается число повторов, а не {count}.")
+                if int(count) > PROGRAM_MAX_REPEAT:
+                    raise ProgramError(f"Строка {lineno}: число повторов больше {PROGRAM_MAX_REPEAT}.")
+                start = self._emit(OP_LOOP_START, int(count))
+                self._expect_end(self._compile_block(depth + 1), lineno)
+                self._emit(OP_LOOP_END, start + 3)
+                self.code[start + 2] = len(self.code)
+            elif word == 'ПОКА':
+                negate, cell = self._condition()
+                start = self._emit(OP_JUMP_IF if negate else OP_JUMP_UNLESS, cell)
+                self._expect_end(self._compile_block(depth + 1), lineno)
+                self._emit(OP_JUMP, start)
+                self.code[start + 2] = len(self.code)
+            elif word == 'ЕСЛИ':
+                negate, cell = self._condition()
+                branch = self._emit(OP_JUMP_IF if negate else OP_JUMP_UNLESS, cell)
+                closing = self._compile_block(depth + 1)
+                if closing == 'ИНАЧЕ':
+                    skip = self._emit(OP_JUMP)
+                    self.code[branch + 2] = len(self.code)
+                    self._expect_end(self._compile_block(depth + 1), lineno)
+                    self.code[skip + 1] = len(self.code)
+                else:
+                    self._expect_end(closing, lineno)
+                    self.code[branch + 2] = len(self.code)
+            else:
+                raise ProgramError(f"Строка {lineno}: неизвестная команда {word}.")
+
+        if depth > 0:
+            raise ProgramError("Неожиданный конец программы: ожидается КОНЕЦ.")
+        return None
+
+    @staticmethod
+    def _expect_end(closing: Optional[str], lineno: int) -> None:
+        if closing != 'КОНЕЦ':
+            raise ProgramError(f"Строка {lineno}: блок должен заканчиваться словом КОНЕЦ.")
+
+    def run(self, labyrinth: RobotLabyrinth, max_steps: int = PROGRAM_MAX_STEPS) -> Dict[str, Any]:
+        """Исполняет программу на копии карты, не более max_steps инструкций."""
+        width, height = labyrinth.width, labyrinth.height
+        grid = bytearray(labyrinth.state.grid)
+        code = self.code.tolist()
+        move_x = [DIRECTION_DELTAS[d][0] for d in DIRECTIONS]
+        move_y = [DIRECTION_DELTAS[d][1] for d in DIRECTIONS]
+        process, forbidden = PROCESS_TABLE, FORBIDDEN_TABLE
+
+        pc = steps = violations = 0
+        x = y = pos = 0
+        counters: List[int] = []
+        status = 'step_limit'
+
+        while steps < max_steps:
+            steps += 1
+            op = code[pc]
+            if op == OP_MOVE:
+                d = code[pc + 1]
+                nx, ny = x + move_x[d], y + move_y[d]
+                if not (0 <= nx < width and 0 <= ny < height):
+                    status = 'out_of_bounds'
+                    break
+                x, y = nx, ny
+                pos = y * width + x
+                violations += forbidden[grid[pos]]
+                pc += 3
+            elif op == OP_PROCESS:
+                grid[pos] = process[grid[pos]]
+                pc += 3
+            elif op == OP_JUMP_UNLESS:
+                pc = pc + 3 if grid[pos] == code[pc + 1] else code[pc + 2]
+            elif op == OP_JUMP_IF:
+                pc = code[pc + 2] if grid[pos] == code[pc + 1] else pc + 3
+            elif op == OP_JUMP:
+                pc = code[pc + 1]
+            elif op == OP_LOOP_END:
+                counters[-1] -= 1
+                if counters[-1] > 0:
+                    pc = code[pc + 1]
+                else:
+                    counters.pop()
+                    pc += 3
+            elif op == OP_LOOP_START:
+                if code[pc + 1] > 0:
+                    counters.append(code[pc + 1])
+                    pc += 3
+                else:
+                    pc = code[pc + 2]
+            else:
+                steps -= 1
+                status = 'finished'
+                break
+        else:
+            if code[pc] == OP_HALT:
+                status = 'finished'
+
+        unprocessed = {CELL_TYPES.index(CellType.RASTENIE), CELL_TYPES.index(CellType.PROBIRKA)}
+        return {
+            'status': status,
+            'steps': steps,
+            'robot_x': x,
+            'robot_y': y,
+            'violations': violations,
+            'map': [[CELL_TYPES[grid[row * width + col]].name for col in range(width)]
+                    for row in range(height)],
+            'is_complete': (x, y) == (width - 1, height - 1) and not unprocessed.intersection(grid),
+        }
+
+
+@lru_cache(maxsize=256)
+def compile_program(source: str) -> RobotProgram:
+    """Компилирует программу; одинаковые тексты компилируются один раз."""
+    return RobotProgram(source)
+
+
+def program_source(config: Dict[str, Any]) -> str:
+    """Текст программы из настроек; не строка - ProgramError."""
+    source = config.get('source', '')
+    if not isinstance(source, str):
+        raise ProgramError("Текст программы должен быть строкой.")
+    return source
+
+
+def validate_program_config(config: Dict[str, Any]) -> None:
+    compile_program(program_source(config))
+    parse_max_steps(config.get('max_steps'), 0, PROGRAM_MAX_STEPS)
+
+
+def run_program(labyrinth: RobotLabyrinth, config: Dict[str, Any]):
+    """Исполняет программу робота из config['source']."""
+    program = compile_program(program_source(config))
+    max_steps = parse_max_steps(config.get('max_steps'), PROGRAM_MAX_STEPS, PROGRAM_MAX_STEPS)
+    return program.run(labyrinth, max_steps)
+
+
+def parse_max_steps(value: Any, default: int, limit: int) -> int:
+    """Проверяет max_steps из запроса: целое число от 0 до limit."""
+    if value is None:
+        return default
+    if isinstance(value, bool) or not isinstance(value, int) or not 0 <= value <= limit:
+        raise ValueError(f"max_steps должен быть целым числом от 0 до {limit}.")
+    return value
+
+
+def validate_snake_config(config: Dict[str, Any]) -> None:
+    parse_max_steps(config.get('max_steps'), 0, SNAKE_MAX_STEPS)
+
+
+def run_snake(labyrinth: RobotLabyrinth, config: Dict[str, Any]):
+    """Прогоняет обход "Змейка" до конца и возвращает итоговое состояние."""
+    robot = RobotBiolog(labyrinth)
+    max_steps = parse_max_steps(config.get('max_steps'), 4 * labyrinth.width * labyrinth.height,
+                                SNAKE_MAX_STEPS)
+    steps = 0
+    while steps < max_steps and robot.execute_single_step():
+        steps += 1
+    state = robot.get_state()
+    state['steps'] = steps
+    return state
+
+
+SNAKE_MAX_STEPS = 4 * MAX_MAP_SIDE * MAX_MAP_SIDE
+
+# Стратегии прохождения карты для очереди заданий.
+STRATEGIES: Dict[str, Callable[[RobotLabyrinth, Dict[str, Any]], Dict[str, Any]]] = {
+    'snake': run_snake,
+    'program': run_program,
+}
+
+# Проверка настроек стратегии при постановке задания; ошибка - ValueError.
+STRATEGY_VALIDATORS: Dict[str, Callable[[Dict[str, Any]], None]] = {
+    'snake': validate_snake_config,
+    'program': validate_program_config,
+}
+
+
+class JobQueueFull(RuntimeError):
+    """В очереди уже max_pending незавершенных вычислений."""
+
+
+class MissionJobQueue:
+    """Очередь заданий миссии на пуле рабочих потоков.
+
+    Результаты кэшируются по хэшу содержимого карты, стратегии и настроек:
+    повторная отправка того же задания отвечает сразу, а одинаковые задания,
+    которые еще считаются, присоединяются к одному вычислению.
+    """
+
+    def __init__(self, max_workers: int = 4, cache_size: int = 256, max_jobs: int = 4096,
+                 max_pending: int = 256, max_jobs_per_key: int = 64):
+        self.cache_size = cache_size
+        self.max_jobs = max_jobs
+        self.max_pending = max_pending
+        self.max_jobs_per_key = max_jobs_per_key
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="mission-job")
+        self._lock = threading.Lock()
+        self._results: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._inflight: Dict[str, Future] = {}
+        self._inflight_jobs: Dict[str, int] = {}
+        self._jobs: "OrderedDict[str, Tuple[str, Future, bool]]" = OrderedDict()
+        self._next_id = 0
+
+    @staticmethod
+    def content_hash(cells: List[List[str]], strategy: str, config: Dict[str, Any]) -> str:
+        payload = json.dumps({'map': cells, 'strategy': strategy, 'config': config},
+                             sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def submit(self, cells: List[List[str]], strategy: str = 'snake',
+               config: Optional[Dict[str, Any]] = None) -> str:
+        """Ставит задание в очередь и возвращает его идентификатор."""
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Неизвестная стратегия: {strategy}")
+        if config is None:
+            config = {}
+        if not isinstance(config, dict):
+            raise ValueError("Настройки задания должны быть объектом.")
+        if strategy in STRATEGY_VALIDATORS:
+            STRATEGY_VALIDATORS[strategy](config)
+        RobotLabyrinth.from_cell_names(cells)
+        key = self.content_hash(cells, strategy, config)
+
+        with self._lock:
+            cached = key in self._results
+            if cached:
+                self._results.move_to_end(key)
+                future: Future = Future()
+                future.set_result(self._results[key])
+            elif key in self._inflight:
+                if self._inflight_jobs[key] >= self.max_jobs_per_key:
+                    raise JobQueueFull(f"Это задание уже ждут {self.max_jobs_per_key} раз, повторите позже.")
+                future = self._inflight[key]
+                self._inflight_jobs[key] += 1
+            elif len(self._inflight) >= self.max_pending:
+                raise JobQueueFull(f"В очереди уже {self.max_pending} заданий, повторите позже.")
+            else:
+                future = self._executor.submit(self._run, key, cells, strategy, config)
+                self._inflight[key] = future
+                self._inflight_jobs[key] = 1
+
+            self._next_id += 1
+            job_id = f"{self._next_id:x}-{key[:12]}"
+            self._jobs[job_id] = (key, future, cached)
+            self._evict_jobs()
+        return job_id
+
+    def _run(self, key: str, cells: List[List[str]], strategy: str, config: Dict[str, Any]):
+        try:
+            result = STRATEGIES[strategy](RobotLabyrinth.from_cell_names(cells), config)
+        except BaseException:
+            with self._lock:
+                self._inflight.pop(key, None)
+                self._inflight_jobs.pop(key, None)
+            raise
+        with self._lock:
+            self._inflight.pop(key, None)
+            self._inflight_jobs.pop(key, None)
+            self._results[key] = result
+            while len(self._results) > self.cache_size:
+                self._results.popitem(last=False)
+        return result
+
+    def _evict_jobs(self) -> None:
+        """Забывает самые старые завершенные задания сверх лимита max_jobs.
+
+        Незавершенные задания из начала очереди переносятся в конец; их число
+        ограничено max_pending * max_jobs_per_key.
+        """
+        pending = 0
+        while len(self._jobs) > self.max_jobs and pending < len(self._jobs):
+            job_id, job = next(iter(self._jobs.items()))
+            if job[1].done():
+                self._jobs.popitem(last=False)
+            else:
+                self._jobs.move_to_end(job_id)
+                pending += 1
+
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Статус задания или None, если оно неизвестно."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        key, future, cached = job
+
+        if not future.done():
+            status = 'running' if future.running() else 'queued'
+        elif future.exception() is not None:
+            status = 'failed'
+        else:
+            status = 'done'
+        info = {'job_id': job_id, 'key': key, 'status': status, 'cached': cached}
+        if status == 'failed':
+            info['error'] = str(future.exception())
+        return info
+
+    def result(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Результат завершенного задания или None, если он еще не готов."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None or not job[1].done() or job[1].exception() is not None:
+            return None
+        return job[1].result()
+
+
+class SessionStore:
+    """Хранилище сессий в SQLite с отложенной записью (write-behind).
+
+    Обработчики запросов только ставят записи в очередь, а фоновый поток
+    сбрасывает их на диск пачками, по одной транзакции на пачку. На диске
+    лежит последний снимок каждой сессии и журнал шагов после него.
+    """
+
+    BATCH_SIZE = 256
+    WRITE_ATTEMPTS = 3
+    RETRY_DELAY = 0.5
+
+    def __init__(self, path: str):
+        self.path = path
+        self._queue: queue.Queue = queue.Queue()
+        self._lost_sessions: set = set()
+
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "session_id TEXT PRIMARY KEY, version INTEGER NOT NULL, "
+                "snapshot TEXT NOT NULL, updated_at REAL NOT NULL)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS journal ("
+                "session_id TEXT NOT NULL, version INTEGER NOT NULL, "
+                "history TEXT NOT NULL, PRIMARY KEY (session_id, version))")
+        conn.close()
+
+        self._writer = threading.Thread(target=self._write_loop, name="session-store", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def save_snapshot(self, session_id: str, snapshot) -> None:
+        """Ставит в очередь снимок сессии; журнал до него больше не нужен."""
+        self._queue.put(('snapshot', session_id, snapshot))
+
+    def append_step(self, session_id: str, version: int, history: List[str]) -> None:
+        """Ставит в очередь запись журнала об одном шаге."""
+        self._queue.put(('step', session_id, (version, history)))
+
+    def needs_snapshot(self, session_id: str) -> bool:
+        """True, если журнал сессии неполон или восстановлен и нужно начать с нового снимка."""
+        return session_id in self._lost_sessions
+
+    def _write_loop(self) -> None:
+        conn = self._connect()
+        running = True
+        while running:
+            batch = [self._queue.get()]
+            while len(batch) < self.BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch:
+                running = False
+                batch = [item for item in batch if item is not None]
+            self._write_batch(conn, batch)
+        conn.close()
+
+    def _write_batch(self, conn: sqlite3.Connection, batch) -> None:
+        """Пишет пачку одной транзакцией; после WRITE_ATTEMPTS неудач пачка теряется."""
+        for attempt in range(1, self.WRITE_ATTEMPTS + 1):
+            try:
+                with conn:
+                    for kind, session_id, payload in batch:
+                        if kind == 'snapshot':
+                            conn.execute(
+                                "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?)",
+                                (session_id, payload['version'], json.dumps(payload), time.time()))
+                            conn.execute("DELETE FROM journal WHERE session_id = ?", (session_id,))
+                            self._lost_sessions.discard(session_id)
+                        else:
+                            version, history = payload
+                            conn.execute(
+                                "INSERT OR REPLACE INTO journal VALUES (?, ?, ?)",
+                                (session_id, version, json.dumps(history)))
+                return
+            except sqlite3.Error:
+                if attempt < self.WRITE_ATTEMPTS:
+                    log.warning("Ошибка записи в %s, попытка %d из %d", self.path, attempt,
+                                self.WRITE_ATTEMPTS, exc_info=True)
+                    time.sleep(self.RETRY_DELAY * attempt)
+                else:
+                    log.exception("Не удалось записать %d записей в %s, они потеряны", len(batch), self.path)
+
+        # Журнал после потери неполон: следующий шаг сессии должен начаться со снимка.
+        self._lost_sessions.update(session_id for _, session_id, _ in batch)
+
+    def load(self, session_id: str) -> Optional[RobotBiolog]:
+        """Восстанавливает сессию: снимок плюс повтор шагов из журнала."""
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT snapshot FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+            if row is None:
+                return None
+            snapshot = json.loads(row[0])
+            steps = conn.execute(
+                "SELECT version, history FROM journal WHERE session_id = ? AND version > ? "
+                "ORDER BY version", (session_id, snapshot['version'])).fetchall()
+        finally:
+            conn.close()
+
+        robot = RobotBiolog.from_snapshot(snapshot)
+        history = list(robot.action_history)
+        for version, lines in steps:
+            if version != robot.version + 1:
+                break
+            robot.execute_single_step()
+            robot.version = version
+            history.extend(json.loads(lines))
+        robot.action_history = history
+        # Хвост журнала после разрыва остался бы на диске: следующий шаг пишет снимок.
+        self._lost_sessions.add(session_id)
+        return robot
+
+    def close(self) -> None:
+        """Дописывает очередь на диск и останавливает фоновый поток."""
+        if self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join()
+
+
+
+def _attach_shared_memory(name: str, create: bool = False, size: int = 0) -> shared_memory.SharedMemory:
+    """Открывает сегмент общей памяти, не отдавая его resource_tracker.
+
+    Иначе сегмент удалялся бы при выходе любого рабочего процесса.
+    """
+    shm = shared_memory.SharedMemory(name=name, create=create, size=size)
+    resource_tracker.unregister(shm._name, 'shared_memory')
+    return shm
+
+
+def _unlink_shared_memory(shm: shared_memory.SharedMemory) -> None:
+    # unlink() снимает регистрацию в resource_tracker, поэтому возвращаем ее.
+    resource_tracker.register(shm._name, 'shared_memory')
+    shm.close()
+    shm.unlink()
+
+
+def _private_dir(path: str) -> str:
+    """Создает каталог, доступный только текущему пользователю, или проверяет существующий."""
+    try:
+        os.mkdir(path, 0o700)
+    except FileExistsError:
+        pass
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+        raise RuntimeError(f"{path} должен быть каталогом текущего пользователя с правами 0700.")
+    return path
+
+
+class _FileLock:
+    """Межпроцессная блокировка через flock плюс блокировка между потоками процесса."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._pid = os.getpid()
+        self._fd = self._open()
+        self._thread_lock = threading.Lock()
+
+    def _open(self) -> int:
+        return os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_NOFOLLOW, 0o600)
+
+    @contextmanager
+    def hold(self):
+        if self._pid != os.getpid():
+            # После fork дескриптор общий с родителем, и flock его не отличит.
+            self._pid = os.getpid()
+            self._fd = self._open()
+            self._thread_lock = threading.Lock()
+        with self._thread_lock:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+
+class _HeaderField:
+    """Поле заголовка в буфере общей памяти; читается и пишется на месте."""
+
+    def __init__(self, fmt: str, offset: int):
+        self._struct = struct.Struct(fmt)
+        self._offset = offset
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        return self._struct.unpack_from(obj.buf, self._offset)[0]
+
+    def __set__(self, obj, value) -> None:
+        self._struct.pack_into(obj.buf, self._offset, value)
+
+
+class SessionRetired(RuntimeError):
+    """Сегмент сессии списан при очистке; сессию нужно открыть заново."""
+
+
+class SharedMissionState:
+    """MissionState в общей памяти.
+
+    Заголовок и карта лежат в сегменте сессии. История - в отдельном
+    сегменте "<сегмент сессии>h<поколение>" из записей [длина u32][utf-8].
+    Когда он заполняется или история очищается, создается сегмент
+    следующего поколения; sync() под блокировкой сессии сверяет поколение
+    и при расхождении переоткрывает его.
+    """
+
+    HEADER_SIZE = 128
+    HISTORY_INITIAL_CAPACITY = 64 * 1024
+    _LINE_LENGTH = struct.Struct('<I')
+
+    version = _HeaderField('<Q', 0)
+    width = _HeaderField('<i', 8)
+    height = _HeaderField('<i', 12)
+    robot_x = _HeaderField('<i', 16)
+    robot_y = _HeaderField('<i', 20)
+    moving_right = _HeaderField('<?', 24)
+    retired = _HeaderField('<?', 25)
+    history_generation = _HeaderField('<I', 28)
+    history_count = _HeaderField('<Q', 32)
+    history_used = _HeaderField('<Q', 40)
+    history_capacity = _HeaderField('<Q', 48)
+    session_id = _HeaderField('64s', 56)
+
+    def __init__(self, name: str, buf: memoryview):
+        self.name = name
+        self.buf = buf
+        self.grid = buf[self.HEADER_SIZE:self.HEADER_SIZE + self.width * self.height]
+        self._history_shm: Optional[shared_memory.SharedMemory] = None
+        self._history_attached = 0
+        self._lines: List[str] = []
+        self._lines_end = 0
+
+    @classmethod
+    def segment_size(cls, width: int, height: int) -> int:
+        return cls.HEADER_SIZE + width * height
+
+    @classmethod
+    def format(cls, buf: memoryview, session_id: str, width: int, height: int) -> None:
+        """Размечает новый сегмент под карту width x height."""
+        buf[:cls.HEADER_SIZE] = bytes(cls.HEADER_SIZE)
+        struct.pack_into('<Qii', buf, 0, 0, width, height)
+        struct.pack_into('64s', buf, 56, session_id.encode('utf-8'))
+
+    def history_segment_name(self, generation: int) -> str:
+        return f"{self.name}h{generation}"
+
+    def sync(self) -> None:
+        """Подключает текущий сегмент истории и дочитывает новые записи."""
+        generation = self.history_generation
+        if generation != self._history_attached:
+            self._close_history()
+            self._history_shm = _attach_shared_memory(self.history_segment_name(generation))
+            self._history_attached = generation
+
+        count = self.history_count
+        if len(self._lines) < count:
+            buf = self._history_shm.buf
+            offset = self._lines_end
+            while len(self._lines) < count:
+                length = self._LINE_LENGTH.unpack_from(buf, offset)[0]
+                offset += self._LINE_LENGTH.size
+                self._lines.append(bytes(buf[offset:offset + length]).decode('utf-8'))
+                offset += length
+            self._lines_end = offset
+
+    def _close_history(self) -> None:
+        if self._history_shm is not None:
+            self._history_shm.close()
+            self._history_shm = None
+        self._history_attached = 0
+        self._lines = []
+        self._lines_end = 0
+
+    def _replace_history(self, data: bytes, count: int, capacity: int) -> None:
+        """Переносит историю в новый сегмент следующего поколения."""
+        old_generation = self.history_generation
+        name = self.history_segment_name(old_generation + 1)
+        try:
+            shm = _attach_shared_memory(name, create=True, size=capacity)
+        except FileExistsError:
+            # Остаток после аварийного завершения: текущее поколение в заголовке старше.
+            _unlink_shared_memory(_attach_shared_memory(name))
+            shm = _attach_shared_memory(name, create=True, size=capacity)
+        shm.buf[:len(data)] = data
+        shm.close()
+
+        self.history_capacity = capacity
+        self.history_used = len(data)
+        self.history_count = count
+        self.history_generation = old_generation + 1
+        if old_generation:
+            self._close_history()
+            _unlink_shared_memory(_attach_shared_memory(self.history_segment_name(old_generation)))
+        self.sync()
+
+    def append_history(self, line: str) -> None:
+        data = line.encode('utf-8')
+        used = self.history_used
+        end = used + self._LINE_LENGTH.size + len(data)
+        if end > self.history_capacity:
+            old = bytes(self._history_shm.buf[:used]) if self._history_shm is not None else b''
+            self._replace_history(old, self.history_count, max(self.HISTORY_INITIAL_CAPACITY, 2 * end))
+
+        buf = self._history_shm.buf
+        self._LINE_LENGTH.pack_into(buf, used, len(data))
+        buf[used + self._LINE_LENGTH.size:end] = data
+        self.history_used = end
+        self.history_count += 1
+        self._lines.append(line)
+        self._lines_end = end
+
+    @property
+    def history(self) -> List[str]:
+        return list(self._lines)
+
+    @history.setter
+    def history(self, lines: List[str]) -> None:
+        data = b''.join(self._LINE_LENGTH.pack(len(encoded)) + encoded
+                        for encoded in (line.encode('utf-8') for line in lines))
+        self._replace_history(data, len(lines), max(self.HISTORY_INITIAL_CAPACITY, 2 * len(data)))
+
+    def close(self) -> None:
+        self._close_history()
+        self.grid.release()
+
+
+class SharedSession:
+    """Сессия в общей памяти: RobotBiolog поверх SharedMissionState.
+
+    Все обращения идут под блокировкой сессии, общей для процессов; перед
+    каждым из них проверяется, что сегмент не списан и история актуальна.
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, lock: _FileLock):
+        self._shm = shm
+        self._lock = lock
+        self.state = SharedMissionState(shm.name, shm.buf)
+        labyrinth = RobotLabyrinth(self.state.width, self.state.height, self.state)
+        self.robot = RobotBiolog(labyrinth, resume=True)
+
+    @contextmanager
+    def _use(self):
+        with self._lock.hold():
+            if self.state.retired:
+                raise SessionRetired(f"Сегмент {self.state.name} списан.")
+            if self.state.history_generation:
+                self.state.sync()
+            yield
+
+    def reset(self):
+        """Начинает миссию заново, как init_simulation(), и возвращает состояние."""
+        with self._use():
+            self.robot.labyrinth.initialize_mission_map()
+            self.robot = RobotBiolog(self.robot.labyrinth)
+            return self.robot.get_state()
+
+    def step(self):
+        """Выполняет один шаг и возвращает состояние, снятое под той же блокировкой."""
+        with self._use():
+            success = self.robot.execute_single_step()
+            state = self.robot.get_state()
+        state['step_success'] = success
+        return state
+
+    def get_state(self):
+        with self._use():
+            return self.robot.get_state()
+
+    def close(self) -> None:
+        self.state.close()
+        self._shm.close()
+
+
+class SharedSessionIndex:
+    """Индекс сессий в общей памяти для нескольких рабочих процессов.
+
+    Индекс - сегмент из MAX_SESSIONS слотов с именами сессий; сессия в
+    слоте i лежит в сегменте "<prefix>_s<i>". Файлы блокировок лежат в
+    закрытом каталоге "<tmp>/<prefix>.locks". Процессы кэшируют открытые
+    сессии, так что индекс читается только при первом обращении.
+
+    Сегмент сессии никогда не пересоздается под работающими процессами:
+    если индекс пропал, новый индекс подключается к уже существующему
+    сегменту той же сессии, а если пропал сам сегмент, запросы падают с
+    ошибкой. Сегменты переживают рабочие процессы; их удаляет unlink():
+    при запуске "python app.py" - при выходе, при нескольких процессах -
+    командой "python app.py --cleanup-shm" после их остановки.
+    """
+
+    MAX_SESSIONS = 64
+    NAME_SIZE = 64
+
+    def __init__(self, prefix: str):
+        if fcntl is None:
+            raise RuntimeError("Общая память сессий требует fcntl (Linux/macOS).")
+        self.prefix = prefix
+        self.lock_dir = _private_dir(os.path.join(tempfile.gettempdir(), f"{prefix}.locks"))
+        self._lock = _FileLock(os.path.join(self.lock_dir, 'index.lock'))
+        self._sessions: Dict[str, SharedSession] = {}
+
+        with self._lock.hold():
+            try:
+                self._index = _attach_shared_memory(
+                    f"{prefix}_index", create=True, size=self.MAX_SESSIONS * self.NAME_SIZE)
+            except FileExistsError:
+                self._index = _attach_shared_memory(f"{prefix}_index")
+
+    def _slot_name(self, slot: int) -> str:
+        offset = slot * self.NAME_SIZE
+        return bytes(self._index.buf[offset:offset + self.NAME_SIZE]).rstrip(b'\0').decode('utf-8')
+
+    def _session_lock(self, slot: int) -> _FileLock:
+        return _FileLock(os.path.join(self.lock_dir, f"s{slot}.lock"))
+
+    def _create(self, slot: int, session_id: str) -> SharedSession:
+        """Создает сессию в слоте или подключается к ее уцелевшему сегменту."""
+        name = f"{self.prefix}_s{slot}"
+        try:
+            shm = _attach_shared_memory(name, create=True, size=SharedMissionState.segment_size(W, H))
+        except FileExistsError:
+            session = SharedSession(_attach_shared_memory(name), self._session_lock(slot))
+            owner = session.state.session_id.rstrip(b'\0').decode('utf-8')
+            if owner != session_id or session.state.retired:
+                session.close()
+                raise RuntimeError(f"Сегмент {name} занят сессией {owner!r}; "
+                                   "остановите процессы и выполните python app.py --cleanup-shm.")
+            return session
+
+        SharedMissionState.format(shm.buf, session_id, W, H)
+        session = SharedSession(shm, self._session_lock(slot))
+        session.reset()
+        return session
+
+    def session(self, session_id: str) -> SharedSession:
+        """Открывает сессию, создавая ее со стандартной картой при первом обращении."""
+        session = self._sessions.get(session_id)
+        if session is not None:
+            return session
+
+        encoded = session_id.encode('utf-8')
+        if not encoded or len(encoded) > self.NAME_SIZE:
+            raise ValueError(f"Недопустимое имя сессии: {session_id!r}")
+
+        with self._lock.hold():
+            names = [self._slot_name(slot) for slot in range(self.MAX_SESSIONS)]
+            if session_id in names:
+                slot = names.index(session_id)
+                try:
+                    shm = _attach_shared_memory(f"{self.prefix}_s{slot}")
+                except FileNotFoundError:
+                    raise RuntimeError(f"Сегмент сессии {session_id!r} удален, но записан в индексе; "
+                                       "остановите процессы и выполните python app.py --cleanup-shm.") from None
+                session = SharedSession(shm, self._session_lock(slot))
+            elif '' in names:
+                slot = names.index('')
+                session = self._create(slot, session_id)
+                offset = slot * self.NAME_SIZE
+                self._index.buf[offset:offset + self.NAME_SIZE] = encoded.ljust(self.NAME_SIZE, b'\0')
+            else:
+                raise RuntimeError(f"Все {self.MAX_SESSIONS} слотов общей памяти заняты.")
+
+        self._sessions[session_id] = session
+        return session
+
+    def run(self, session_id: str, action: Callable[[SharedSession], Any]):
+        """Выполняет action над сессией; если ее сегмент списан, открывает сессию заново."""
+        try:
+            return action(self.session(session_id))
+        except SessionRetired:
+            stale = self._sessions.pop(session_id, None)
+            if stale is not None:
+                stale.close()
+            return action(self.session(session_id))
+
+    def unlink(self) -> None:
+        """Списывает и удаляет сегменты сессий, индекс и каталог блокировок."""
+        with self._lock.hold():
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+            for slot in range(self.MAX_SESSIONS):
+                if not self._slot_name(slot):
+                    continue
+                try:
+                    shm = _attach_shared_memory(f"{self.prefix}_s{slot}")
+                except FileNotFoundError:
+                    continue
+                state = SharedMissionState(shm.name, shm.buf)
+                with self._session_lock(slot).hold():
+                    state.retired = True
+                    generation = state.history_generation
+                state.close()
+                if generation:
+                    try:
+                        _unlink_shared_memory(_attach_shared_memory(state.history_segment_name(generation)))
+                    except FileNotFoundError:
+                        pass
+                _unlink_shared_memory(shm)
+
+            _unlink_shared_memory(self._index)
+            for name in os.listdir(self.lock_dir):
+                os.remove(os.path.join(self.lock_dir, name))
+            os.rmdir(self.lock_dir)
 
 
 app = Flask(__name__)
 
 ROBOT_SIMULATOR: Optional[RobotBiolog] = None
 
+# Путь к базе SQLite; если не задан, состояние живет только в памяти.
+DB_PATH = os.environ.get('ROBOT_DB_PATH')
+SESSION_ID = 'default'
+SNAPSHOT_EVERY = 50
+
+# Префикс сегментов общей памяти; если задан, сессия общая для всех процессов.
+SHM_PREFIX = os.environ.get('ROBOT_SHM_PREFIX')
+
+if DB_PATH and SHM_PREFIX:
+    raise RuntimeError("ROBOT_DB_PATH и ROBOT_SHM_PREFIX несовместимы: "
+                       "сессии в общей памяти не сохраняются в SQLite.")
+
+STORE: Optional[SessionStore] = SessionStore(DB_PATH) if DB_PATH else None
+SHARED_SESSIONS: Optional[SharedSessionIndex] = SharedSessionIndex(SHM_PREFIX) if SHM_PREFIX else None
+
+JOB_QUEUE = MissionJobQueue(max_workers=min(4, os.cpu_count() or 1))
+
 
 def init_simulation():
     global ROBOT_SIMULATOR
@@ -253,10 +1351,20 @@ def init_simulation():
     labyrinth.initialize_mission_map()
     robot = RobotBiolog(labyrinth)
     ROBOT_SIMULATOR = robot
+    if STORE:
+        STORE.save_snapshot(SESSION_ID, robot.to_snapshot())
     return robot
 
 
-init_simulation()
+def get_simulator() -> RobotBiolog:
+    """Возвращает текущую сессию, при первом обращении поднимая ее из базы."""
+    global ROBOT_SIMULATOR
+    if ROBOT_SIMULATOR is None:
+        restored = STORE.load(SESSION_ID) if STORE else None
+        if restored is None:
+            return init_simulation()
+        ROBOT_SIMULATOR = restored
+    return ROBOT_SIMULATOR
 
 
 HOST = '127.0.0.1'
@@ -279,23 +1387,126 @@ def index():
 @app.route('/reset', methods=['POST'])
 def reset_simulation():
     """Сбрасывает симуляцию и возвращает начальное состояние."""
+    if SHARED_SESSIONS:
+        return jsonify(SHARED_SESSIONS.run(SESSION_ID, SharedSession.reset))
+
     robot = init_simulation()
     return jsonify(robot.get_state())
 
 
+@app.route('/state', methods=['GET'])
+def get_simulation_state():
+    """Возвращает текущее состояние без выполнения шага."""
+    if SHARED_SESSIONS:
+        return jsonify(SHARED_SESSIONS.run(SESSION_ID, SharedSession.get_state))
+    return jsonify(get_simulator().get_state())
+
+
 @app.route('/step', methods=['POST'])
 def execute_step():
     """Выполняет один шаг и возвращает новое состояние."""
-    if ROBOT_SIMULATOR is None:
-        init_simulation()
+    if SHARED_SESSIONS:
+        return jsonify(SHARED_SESSIONS.run(SESSION_ID, SharedSession.step))
+
+    robot = get_simulator()
+
+    history_len = len(robot.action_history)
+    version = robot.version
+    success = robot.execute_single_step()
+    if STORE and robot.version != version:
+        if robot.version % SNAPSHOT_EVERY == 0 or STORE.needs_snapshot(SESSION_ID):
+            STORE.save_snapshot(SESSION_ID, robot.to_snapshot())
+        else:
+            STORE.append_step(SESSION_ID, robot.version, robot.action_history[history_len:])
 
-    success = ROBOT_SIMULATOR.execute_single_step()
-    state = ROBOT_SIMULATOR.get_state()
+    state = robot.get_state()
     state['step_success'] = success
     return jsonify(state)
 
 
+def request_object() -> Optional[Dict[str, Any]]:
+    """Тело запроса как JSON-объект: пустое тело - {}, не JSON-объект - None."""
+    if not request.get_data():
+        return {}
+    data = request.get_json(silent=True)
+    return data if isinstance(data, dict) else None
+
+
+def default_mission_cells() -> List[List[str]]:
+    labyrinth = RobotLabyrinth(W, H)
+    labyrinth.initialize_mission_map()
+    return labyrinth.cell_names()
+
+
+@app.route('/program', methods=['POST'])
+def execute_program():
+    """Компилирует и исполняет программу робота на карте без сохранения состояния."""
+    data = request_object()
+    if data is None:
+        return jsonify({'error': 'Тело запроса должно быть JSON-объектом.'}), 400
+    cells = data.get('map')
+    if cells is None:
+        cells = default_mission_cells()
+
+    try:
+        labyrinth = RobotLabyrinth.from_cell_names(cells)
+        program = compile_program(program_source(data))
+        max_steps = parse_max_steps(data.get('max_steps'), PROGRAM_MAX_STEPS, PROGRAM_MAX_STEPS)
+    except (ValueError, TypeError, OverflowError) as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(program.run(labyrinth, max_steps))
+
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """Ставит миссию в очередь; без карты используется стандартная карта 5x5."""
+    data = request_object()
+    if data is None:
+        return jsonify({'error': 'Тело запроса должно быть JSON-объектом.'}), 400
+    cells = data.get('map')
+    if cells is None:
+        cells = default_mission_cells()
+
+    try:
+        job_id = JOB_QUEUE.submit(cells, data.get('strategy', 'snake'), data.get('config'))
+    except (ValueError, TypeError, OverflowError) as e:
+        return jsonify({'error': str(e)}), 400
+    except JobQueueFull as e:
+        return jsonify({'error': str(e)}), 429
+    return jsonify(JOB_QUEUE.status(job_id)), 202
+
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Возвращает статус задания."""
+    status = JOB_QUEUE.status(job_id)
+    if status is None:
+        return jsonify({'error': 'Задание не найдено.'}), 404
+    return jsonify(status)
+
+
+@app.route('/jobs/<job_id>/result', methods=['GET'])
+def job_result(job_id):
+    """Возвращает результат задания, если оно завершено."""
+    status = JOB_QUEUE.status(job_id)
+    if status is None:
+        return jsonify({'error': 'Задание не найдено.'}), 404
+    if status['status'] == 'failed':
+        return jsonify(status)
+    if status['status'] != 'done':
+        return jsonify(status), 202
+    return jsonify(JOB_QUEUE.result(job_id))
+
+
 if __name__ == '__main__':
+    if '--cleanup-shm' in sys.argv:
+        # Удаляет общую память ROBOT_SHM_PREFIX после остановки всех рабочих процессов.
+        if SHARED_SESSIONS:
+            SHARED_SESSIONS.unlink()
+        sys.exit(0)
+    if SHARED_SESSIONS:
+        atexit.register(SHARED_SESSIONS.unlink)
+
     print(f"Flask-сервер запускается на {URL}...")
 
     threading.Timer(1, open_browser).start()